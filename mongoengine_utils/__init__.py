@@ -7,11 +7,13 @@ from .encoder import GoodJSONEncoder
 from .decoder import generate_object_hook
 from .document import Document, EmbeddedDocument
 from .queryset import QuerySet
+from .scope import goodjson_scope
 from .fields import FollowReferenceField
 from .pagination import Pagination, ListFieldPagination
 
 __all__ = (
     "GoodJSONEncoder", "generate_object_hook",
     "Document", "EmbeddedDocument", "QuerySet",
-    "FollowReferenceField", "Pagination", "ListFieldPagination"
+    "FollowReferenceField", "Pagination", "ListFieldPagination",
+    "goodjson_scope"
 )
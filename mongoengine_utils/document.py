@@ -4,17 +4,76 @@
 """Documents implementing human-readable JSON serializer."""
 
 import json
+from collections import defaultdict
+from weakref import WeakKeyDictionary
 
 try:
-    from functools import singledispatch
+    import orjson
 except ImportError:
-    from singledispatch import singledispatch
+    orjson = None
 
 import mongoengine as db
 from bson import SON, DBRef
 from .encoder import GoodJSONEncoder
 from .decoder import generate_object_hook
-from .queryset import QuerySet
+from .queryset import QuerySet, _get_field_meta
+from .scope import goodjson_scope
+
+_OBJECT_HOOK_CACHE = WeakKeyDictionary()
+_GOOD_JSON_DEFAULT = GoodJSONEncoder().default
+
+
+def _dumps(obj, use_orjson=False, *args, **kwargs):
+    """
+    Encode obj into JSON string.
+
+    When use_orjson is set, orjson is installed and no argument other than
+    the default encoder class is given, orjson is used. Note that orjson
+    doesn't put any whitespace, doesn't escape non-ASCII characters and
+    encodes NaN and Infinity into null, unlike json.dumps.
+    json.dumps is used otherwise.
+    """
+    if use_orjson and orjson is not None and not args and \
+            kwargs == {"cls": GoodJSONEncoder}:
+        try:
+            return orjson.dumps(obj, default=_GOOD_JSON_DEFAULT).decode()
+        except TypeError:
+            # e.g. non-string keys or too big integers. json.dumps will
+            # handle it or raise a proper error.
+            pass
+    return json.dumps(obj, *args, **kwargs)
+
+
+def _pop_good_dict_kwargs(kwargs):
+    """
+    Pop the arguments of Helper._to_good_dict from to_json kwargs.
+
+    GoodJSONEncoder is set to kwargs as the encoder unless it is given.
+    """
+    options = {
+        "use_db_field": kwargs.pop("use_db_field", True),
+        "follow_reference": kwargs.pop("follow_reference", False),
+        "max_depth": kwargs.pop("max_depth", 3),
+        "current_depth": kwargs.pop("current_depth", 0)
+    }
+    if "cls" not in kwargs:
+        kwargs["cls"] = GoodJSONEncoder
+    return options
+
+
+def normalize_reference(ref_id, fld):
+    """Normalize Reference."""
+    if isinstance(ref_id, dict):
+        return fld.to_python(ref_id["id"])
+    if isinstance(ref_id, list):
+        to_python = fld.to_python
+        # The ids can be the dicts of the followed documents.
+        return [
+            to_python(ref["id"]) if isinstance(ref, dict) else
+            ref and to_python(ref) or None
+            for ref in (getattr(item, "id", item) for item in ref_id)
+        ]
+    return ref_id and fld.to_python(ref_id) or None
 
 
 class Helper(object):
@@ -22,129 +81,98 @@ class Helper(object):
 
     object = object
 
-    def _follow_reference(self, max_depth, current_depth,
-                          use_db_field, *args, **kwargs):
-        from .fields import FollowReferenceField
-        ret = {}
-        for fldname in self:
-            fld = self._fields.get(fldname)
-            is_list = isinstance(fld, db.ListField)
-            target = fld.field if is_list else fld
-
-            if all([
-                isinstance(
-                    target, (db.ReferenceField, db.EmbeddedDocumentField)
-                ), not isinstance(target, FollowReferenceField)
-            ]):
-                value = None
-                if is_list:
-                    value = []
-                    for doc in getattr(self, fldname, []):
-                        value.append(json.loads((
-                            target.document_type.objects(
-                                id=doc.id
-                            ).get() if isinstance(doc, DBRef) else doc
-                        ).to_json(
-                            follow_reference=True,
-                            max_depth=max_depth,
-                            current_depth=current_depth + 1,
-                            use_db_field=use_db_field,
-                            *args, **kwargs
-                        )))
-                else:
-                    doc = getattr(self, fldname, None)
-                    value = json.loads(
-                        (
-                            target.document_type.objects(
-                                id=doc.id
-                            ).get() if isinstance(doc, DBRef) else doc
-                        ).to_json(
-                            follow_reference=True,
-                            max_depth=max_depth,
-                            current_depth=current_depth + 1,
-                            use_db_field=use_db_field,
-                            *args, **kwargs
-                        )
-                    ) if doc else doc
-                if value is not None:
-                    ret.update({fldname: value})
-        return ret
-
-    def __set_gj_flag_sub_field(self, instance, fld, cur_depth):
-        """Set $$good_json$$ flag to subfield."""
-        from .fields import FollowReferenceField
-
-        def set_good_json(fld):
-            setattr(fld, "$$good_json$$", True)
-            setattr(fld, "$$cur_depth$$", cur_depth)
-
-        @singledispatch
-        def set_flag_recursive(fld, instance):
-            set_good_json(fld)
-
-        @set_flag_recursive.register(db.ListField)
-        def set_flag_list(fld, instance):
-            set_good_json(fld.field)
-
-        @set_flag_recursive.register(db.EmbeddedDocumentField)
-        def set_flag_emb(fld, instance):
-            if isinstance(instance, Helper):
-                instance.begin_goodjson(cur_depth)
-
-        @set_flag_recursive.register(FollowReferenceField)
-        def set_flag_self(fld, instance):
-            set_good_json(fld)
-
-        set_flag_recursive(fld, instance)
-
-    def __unset_gj_flag_sub_field(self, instance, fld, cur_depth):
-        """Unset $$good_json$$ to subfield."""
-        from .fields import FollowReferenceField
-
-        def unset_flag(fld):
-            setattr(fld, "$$good_json$$", None)
-            setattr(fld, "$$cur_depth$$", None)
-            delattr(fld, "$$good_json$$")
-            delattr(fld, "$$cur_depth$$")
-
-        @singledispatch
-        def unset_flag_recursive(fld, instance):
-            unset_flag(fld)
-
-        @unset_flag_recursive.register(db.ListField)
-        def unset_flag_list(fld, instance):
-            unset_flag(fld.field)
-
-        @unset_flag_recursive.register(db.EmbeddedDocumentField)
-        def unset_flag_emb(fld, instance):
-            if isinstance(instance, Helper):
-                instance.end_goodjson(cur_depth)
-
-        @unset_flag_recursive.register(FollowReferenceField)
-        def unset_flag_self(fld, instance):
-            unset_flag(fld)
-
-        unset_flag_recursive(fld, instance)
+    def _follow_reference(self, fields, max_depth, current_depth,
+                          use_db_field):
+        """
+        Convert the referenced documents into dicts.
 
-    def begin_goodjson(self, cur_depth=0):
-        """Enable GoodJSON Flag."""
-        for (name, fld) in self._fields.items():
-            self.__set_gj_flag_sub_field(
-                getattr(self, name), fld, cur_depth=cur_depth
+        Parameters:
+            fields: A list of the pairs of the field metadata and the value
+                to be followed.
+            max_depth, current_depth, use_db_field: Same as to_json.
+        """
+        # The referenced documents are fetched with one query per document
+        # type, not one query per reference.
+        ref_ids = defaultdict(set)
+        for (meta, value) in fields:
+            for doc in (value or []) if meta.is_list else [value]:
+                if isinstance(doc, DBRef):
+                    ref_ids[meta.target.document_type].add(doc.id)
+
+        fetched = {
+            doc_type: doc_type.objects.in_bulk(list(ids))
+            for (doc_type, ids) in ref_ids.items()
+        }
+
+        def to_dict(target, doc):
+            if isinstance(doc, DBRef):
+                try:
+                    doc = fetched[target.document_type][doc.id]
+                except KeyError:
+                    raise target.document_type.DoesNotExist(
+                        ("{} matching query does not exist.").format(
+                            target.document_type._class_name
+                        )
+                    )
+            return doc._to_good_dict(
+                follow_reference=True,
+                max_depth=max_depth,
+                current_depth=current_depth + 1,
+                use_db_field=use_db_field
             )
 
-    def end_goodjson(self, cur_depth=0):
-        """Stop GoodJSON Flag."""
-        for (name, fld) in self._fields.items():
-            self.__unset_gj_flag_sub_field(
-                getattr(self, name), fld, cur_depth=cur_depth
-            )
+        ret = {}
+        for (meta, value) in fields:
+            if meta.is_list:
+                value = [to_dict(meta.target, doc) for doc in value or []]
+            else:
+                value = to_dict(meta.target, value) if value else value
+            if value is not None:
+                ret[meta.name] = value
+        return ret
 
     def to_mongo(self, *args, **kwargs):
         """Convert into mongodb compatible dict."""
         result = super(Helper, self).to_mongo(*args, **kwargs)
         return result
 
+    def _to_good_dict(self, use_db_field=True, follow_reference=False,
+                      max_depth=3, current_depth=0):
+        """
+        Convert into the dict that is encoded by to_json.
+
+        The parameters are the same as to_json. The referenced documents are
+        converted into dicts as well, so that the whole tree is encoded into
+        JSON only once.
+        """
+        class_meta = _get_field_meta(self.__class__)
+        if class_meta.needs_goodjson:
+            with goodjson_scope():
+                data = self.to_mongo(use_db_field)
+        else:
+            data = self.to_mongo(use_db_field)
+        if use_db_field and class_meta.renames_id:
+            try:
+                data["id"] = data.pop("_id")
+            except KeyError:
+                pass
+        elif "_id" in data and "id" not in data:
+            data["id"] = data.pop("_id", None)
+
+        for name in class_meta.exclude_to:
+            data.pop(name, None)
+
+        if class_meta.follow and follow_reference and \
+                (max_depth is None or current_depth < max_depth):
+            # The raw values are read from _data because getattr would
+            # dereference each reference with its own query.
+            data.update(self._follow_reference([
+                (meta, self._data.get(meta.name))
+                for meta in class_meta.follow
+            ], max_depth, current_depth, use_db_field))
+
+        return data
+
     def to_json(self, *args, **kwargs):
         """
         Encode to human-readable json.
@@ -159,39 +187,34 @@ class Helper(object):
             current_depth: This is used internally to identify current
                 recursion depth. Therefore, you should leave this value as-is.
                 By default, the value is 0.
+            use_orjson: set True to encode with orjson if it is installed
+                and no other json.dumps argument is given. The output
+                has no whitespace, non-ASCII characters aren't escaped and
+                NaN is encoded into null. By default, the value is False.
             *args, **kwargs: Any arguments, keyword arguments to
                 tell json.dumps.
         """
-        use_db_field = kwargs.pop('use_db_field', True)
-        follow_reference = kwargs.pop("follow_reference", False)
-        max_depth = kwargs.pop("max_depth", 3)
-        current_depth = kwargs.pop("current_depth", 0)
-
-        if "cls" not in kwargs:
-            kwargs["cls"] = GoodJSONEncoder
-
-        self.begin_goodjson()
-
-        data = self.to_mongo(use_db_field)
-        if "_id" in data and "id" not in data:
-            data["id"] = data.pop("_id", None)
-
-        for name, fld in self._fields.items():
-            if any([
-                getattr(fld, "exclude_to_json", None),
-                getattr(fld, "exclude_json", None)
-            ]):
-                data.pop(name, None)
+        use_orjson = kwargs.pop("use_orjson", False)
+        data = self._to_good_dict(**_pop_good_dict_kwargs(kwargs))
+        return _dumps(data, use_orjson, *args, **kwargs)
 
-        if follow_reference and \
-                (current_depth < max_depth or max_depth is None):
-            data.update(self._follow_reference(
-                max_depth, current_depth, use_db_field, *args, **kwargs
-            ))
+    def to_json_stream(self, fp, *args, **kwargs):
+        """
+        Encode to human-readable json and write it into fp.
 
-        self.end_goodjson()
+        Unlike to_json, the whole JSON string isn't built in memory, which
+        is useful to write a large document into a file or a response.
 
-        return json.dumps(data, *args, **kwargs)
+        Parameters:
+            fp: A file-like object to be written.
+            *args, **kwargs: The same as to_json, but the rest of the
+                arguments are passed to json.dump. use_orjson is accepted
+                for compatibility with to_json and ignored, because orjson
+                can't write into a file-like object.
+        """
+        kwargs.pop("use_orjson", None)
+        data = self._to_good_dict(**_pop_good_dict_kwargs(kwargs))
+        json.dump(data, fp, *args, **kwargs)
 
     def paginate(self, page, per_page=15):
         start_index = (page - 1) * per_page
@@ -199,6 +222,30 @@ class Helper(object):
 
         return self.object[start_index:end_index]
 
+    @classmethod
+    def _get_object_hook(cls):
+        """Get the object hook of the class, generating it only once."""
+        hook = _OBJECT_HOOK_CACHE.get(cls)
+        if hook is None:
+            hook = _OBJECT_HOOK_CACHE[cls] = generate_object_hook(cls)
+        return hook
+
+    @classmethod
+    def _from_good_dict(cls, dct, created=False):
+        """Convert the dict decoded from human-readable json into document."""
+        class_meta = _get_field_meta(cls)
+        for name in class_meta.exclude_from:
+            dct.pop(name, None)
+        from_son_result = cls._from_son(SON(dct), created=created)
+
+        for meta in class_meta.references:
+            value = dct.get(meta.name)
+            setattr(
+                from_son_result, meta.name,
+                normalize_reference(getattr(value, "id", value), meta.target)
+            )
+        return from_son_result
+
     @classmethod
     def from_json(cls, json_str, created=False, *args, **kwargs):
         """
@@ -207,52 +254,101 @@ class Helper(object):
         Parameters:
             json_str: JSON string that should be passed to the serialized
             created: a parameter that is passed to cls._from_son.
+            lazy: Set True to decode each field when it is read for the first
+                time. In this case, a proxy of the document is returned, and
+                the whole document is decoded when anything other than the
+                fields without reference is accessed. By default, the value
+                is False.
             *args, **kwargs: Any additional arguments that is passed to
                 json.loads.
         """
-        from .fields import FollowReferenceField
-        hook = generate_object_hook(cls)
-        if "object_hook" not in kwargs:
-            kwargs["object_hook"] = hook
-        dct = json.loads(json_str, *args, **kwargs)
-        for name, fld in cls._fields.items():
-            if any([
-                getattr(fld, "exclude_from_json", None),
-                getattr(fld, "exclude_json", None)
-            ]):
-                dct.pop(name, None)
-        from_son_result = cls._from_son(SON(dct), created=created)
-
-        @singledispatch
-        def normalize_reference(ref_id, fld):
-            """Normalize Reference."""
-            return ref_id and fld.to_python(ref_id) or None
-
-        @normalize_reference.register(dict)
-        def normalize_reference_dict(ref_id, fld):
-            """Normalize Reference for dict."""
-            return fld.to_python(ref_id["id"])
-
-        @normalize_reference.register(list)
-        def normalize_reference_list(ref_id, fld):
-            """Normalize Reference for list."""
-            return [
-                normalize_reference(ref.id, fld) for ref in ref_id
-            ]
-
-        for fldname, fld in cls._fields.items():
-            target = fld.field if isinstance(fld, db.ListField) else fld
-
-            if not isinstance(target, db.ReferenceField) or \
-                    isinstance(target, FollowReferenceField):
-                continue
-
-            value = dct.get(fldname)
-            setattr(
-                from_son_result, fldname,
-                normalize_reference(getattr(value, "id", value), target)
+        lazy = kwargs.pop("lazy", False)
+        hook = kwargs.pop("object_hook", None) or cls._get_object_hook()
+        if lazy:
+            return _LazyDocProxy(
+                cls, json.loads(json_str, *args, **kwargs), hook, created
             )
-        return from_son_result
+        kwargs["object_hook"] = hook
+        return cls._from_good_dict(
+            json.loads(json_str, *args, **kwargs), created=created
+        )
+
+
+def _apply_object_hook(value, hook):
+    """Apply object hook to the dicts in value like json.loads does."""
+    if isinstance(value, dict):
+        return hook({
+            key: _apply_object_hook(item, hook)
+            for (key, item) in value.items()
+        })
+    if isinstance(value, list):
+        return [_apply_object_hook(item, hook) for item in value]
+    return value
+
+
+class _LazyDocProxy(object):
+    """
+    Document proxy returned by from_json(lazy=True).
+
+    The fields are decoded with the object hook and to_python when they are
+    read. Accessing reference fields, excluded fields, missing fields or
+    anything else than the fields (e.g. save, to_json) decodes the whole
+    document and the proxy delegates to it from then on. The values already
+    read are not decoded again, and the same objects (possibly modified in
+    place) are set to the decoded document.
+
+    Note that the proxy is not an instance of the document class, so
+    isinstance(proxy, cls) is False and so is proxy == document. Call
+    from_json without lazy when the actual document is needed.
+    """
+
+    __slots__ = ("_cls", "_dct", "_hook", "_created", "_values", "_doc")
+
+    def __init__(self, cls, dct, hook, created=False):
+        """Initialize the proxy with the dict decoded without the hook."""
+        object.__setattr__(self, "_cls", cls)
+        object.__setattr__(self, "_dct", dct)
+        object.__setattr__(self, "_hook", hook)
+        object.__setattr__(self, "_created", created)
+        object.__setattr__(self, "_values", {})
+        object.__setattr__(self, "_doc", None)
+
+    def _get_document(self):
+        """Decode the whole document."""
+        if self._doc is None:
+            # The fields already read aren't decoded again, e.g. not to
+            # save FollowReferenceField(autosave=True) twice.
+            doc = self._cls._from_good_dict(_apply_object_hook({
+                key: value for (key, value) in self._dct.items()
+                if key not in self._values
+            }, self._hook), created=self._created)
+            for name, value in self._values.items():
+                if getattr(doc, name) is not value:
+                    setattr(doc, name, value)
+            object.__setattr__(self, "_doc", doc)
+        return self._doc
+
+    def __getattr__(self, name):
+        """Decode the field, or delegate to the decoded document."""
+        if self._doc is None:
+            try:
+                return self._values[name]
+            except KeyError:
+                pass
+            meta = _get_field_meta(self._cls).fields_by_name.get(name)
+            if meta is not None and not meta.is_ref and \
+                    not meta.exclude_from and name in self._dct:
+                value = self._hook({
+                    name: _apply_object_hook(self._dct[name], self._hook)
+                })[name]
+                value = self._cls._fields[name].to_python(value)
+                self._values[name] = value
+                return value
+        return getattr(self._get_document(), name)
+
+    def __setattr__(self, name, value):
+        """Set the attribute to the decoded document."""
+        setattr(self._get_document(), name, value)
 
 
 class Document(Helper, db.Document):
@@ -6,6 +6,7 @@
 import json
 import mongoengine as db
 from ..document import Document
+from ..scope import _GJ_STATE, goodjson_scope
 
 
 class FollowReferenceField(db.ReferenceField):
@@ -46,9 +47,8 @@ class FollowReferenceField(db.ReferenceField):
         Parameters:
             document: The document.
         """
-        cur_depth = getattr(self, "$$cur_depth$$", self.max_depth)
-        if not getattr(self, "$$good_json$$", None) or \
-                cur_depth >= self.max_depth:
+        cur_depth = _GJ_STATE.get()
+        if cur_depth is None or cur_depth >= self.max_depth:
             return super(FollowReferenceField, self).to_mongo(
                 document, **kwargs
             )
@@ -62,11 +62,10 @@ class FollowReferenceField(db.ReferenceField):
                     FollowReferenceField, self
                 ).to_mongo(document, **kwargs)
             ).get()
-        if isinstance(doc, Document):
-            doc.begin_goodjson(cur_depth + 1)
-        ret = doc.to_mongo(**kwargs)
-        if isinstance(doc, Document):
-            doc.end_goodjson(cur_depth + 1)
+        with goodjson_scope(
+            cur_depth + 1 if isinstance(doc, Document) else None
+        ):
+            ret = doc.to_mongo(**kwargs)
         if "_id" in ret and issubclass(self.document_type, Document):
             ret["id"] = ret.pop("_id", None)
         return ret
@@ -1,17 +1,18 @@
 # -*- coding: utf-8 -*-
-import math
-
 import mongoengine
 
 from mongoengine.queryset import MultipleObjectsReturned, DoesNotExist, QuerySet
 from mongoengine import ValidationError
+from bson import DBRef
+
+from .queryset import ToJSONBatchMixin
 
 
 class MongoEnginePaginationException(Exception):
     pass
 
 
-class BaseQuerySet(mongoengine.QuerySet):
+class BaseQuerySet(ToJSONBatchMixin, mongoengine.QuerySet):
     """
     A base queryset with handy extras
     """
@@ -30,9 +31,11 @@ class BaseQuerySet(mongoengine.QuerySet):
 
         #return obj
 
-    def paginate(self, page, per_page, error_out=True):
+    def paginate(self, page, per_page, error_out=True, total=None,
+            eager_refs=()):
 
-        return Pagination(self, page, per_page)
+        return Pagination(self, page, per_page, total=total,
+            eager_refs=eager_refs)
 
     def paginate_field(self, field_name, doc_id, page, per_page,
             total=None):
@@ -50,32 +53,83 @@ class Document(mongoengine.Document):
             'queryset_class': BaseQuerySet}
 
 
-class Pagination(object):
+def _count_pages(total, per_page):
+    """The total number of pages"""
+    return (total + per_page - 1) // per_page if per_page else 0
 
-    def __init__(self, iterable, page, per_page):
 
+def _prefetch_references(items, field_names):
+    """Dereferences the given reference fields of the documents in items
+    with one query per field instead of one query per document.
+    The fields must be ReferenceField or ListField of ReferenceField.
+    """
+    if not items:
+        return
+    for field_name in field_names:
+        field = items[0]._fields[field_name]
+        is_list = isinstance(field, mongoengine.ListField)
+        document_type = (field.field if is_list else field).document_type
+
+        values = [item._data.get(field_name) for item in items]
+        ids = set()
+        for value in values:
+            for ref in (value or []) if is_list else [value]:
+                if isinstance(ref, DBRef):
+                    ids.add(ref.id)
+        if not ids:
+            continue
+        fetched = document_type.objects.in_bulk(list(ids))
+
+        def deref(ref):
+            if isinstance(ref, DBRef):
+                return fetched.get(ref.id, ref)
+            return ref
+
+        for item, value in zip(items, values):
+            if is_list:
+                item._data[field_name] = [deref(ref) for ref in value or []]
+            else:
+                item._data[field_name] = deref(value)
+
+
+class Pagination(object):
+
+    def __init__(self, iterable, page, per_page, total=None,
+                 eager_refs=()):
+        """Paginates a queryset or a list.
+        Total is an argument because it can be computed more efficiently
+        elsewhere, or is already known when moving to the previous/next
+        page. Otherwise the queryset is counted on the server (use
+        ``queryset.hint()`` beforehand to tune the count query).
+        eager_refs is the names of the reference fields that should be
+        dereferenced for all items of the page at once.
+        The page of a queryset is fetched with skip() and limit(), which
+        replace any skip or limit (e.g. a slice) already applied to it.
+        """
         if page < 1:
             raise MongoEnginePaginationException()
 
         self.iterable = iterable
         self.page = page
         self.per_page = per_page
-        self.total = len(iterable)
+        self.eager_refs = eager_refs
+        if total is None:
+            total = iterable.count() if isinstance(iterable, QuerySet) \
+                else len(iterable)
+        self.total = total
+        self.pages = _count_pages(self.total, per_page)
 
         start_index = (page - 1) * per_page
         end_index = page * per_page
 
-        self.items = iterable[start_index:end_index]
-        if isinstance(self.items, QuerySet):
-            self.items = self.items.select_related()
+        if isinstance(iterable, QuerySet):
+            self.items = list(iterable.skip(start_index).limit(per_page))
+            _prefetch_references(self.items, eager_refs)
+        else:
+            self.items = iterable[start_index:end_index]
         if not self.items and page != 1:
             raise MongoEnginePaginationException()
 
-    @property
-    def pages(self):
-        """The total number of pages"""
-        return int(math.ceil(self.total / float(self.per_page)))
-
     def prev(self, error_out=False):
         """Returns a :class:`Pagination` object for the previous page."""
         assert self.iterable is not None, 'an object is required ' \
@@ -85,7 +139,8 @@ class Pagination(object):
             iterable._skip = None
             iterable._limit = None
             iterable = iterable.clone()
-        return self.__class__(iterable, self.page - 1, self.per_page)
+        return self.__class__(iterable, self.page - 1, self.per_page,
+            total=self.total, eager_refs=self.eager_refs)
 
     @property
     def prev_num(self):
@@ -106,7 +161,8 @@ class Pagination(object):
             iterable._skip = None
             iterable._limit = None
             iterable = iterable.clone()
-        return self.__class__(iterable, self.page + 1, self.per_page)
+        return self.__class__(iterable, self.page + 1, self.per_page,
+            total=self.total, eager_refs=self.eager_refs)
 
     @property
     def has_next(self):
@@ -141,12 +197,16 @@ class Pagination(object):
               </div>
             {% endmacro %}
         """
+        # Only the numbers of the three ranges are visited, so the cost
+        # doesn't depend on the number of the pages.
+        ranges = sorted([
+            (1, left_edge),
+            (self.page - left_current, self.page + right_current - 1),
+            (self.pages - right_edge + 1, self.pages)
+        ])
         last = 0
-        for num in xrange(1, self.pages + 1):
-            if num <= left_edge or \
-               (num > self.page - left_current - 1 and
-                num < self.page + right_current) or \
-               num > self.pages - right_edge:
+        for start, end in ranges:
+            for num in range(max(start, last + 1), min(end, self.pages) + 1):
                 if last + 1 != num:
                     yield None
                 yield num
@@ -183,6 +243,7 @@ class ListFieldPagination(Pagination):
             ).first(), field_name)
 
         self.total = total or len(self.items)
+        self.pages = _count_pages(self.total, per_page)
 
         if not self.items and page != 1:
             raise MongoEnginePaginationException()
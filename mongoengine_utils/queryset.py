@@ -4,20 +4,149 @@
 """Queryset encoder."""
 
 import json
+from collections import namedtuple
+from weakref import WeakKeyDictionary
 
 try:
     from functools import singledispatch
 except:
     from singledispatch import singledispatch
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
 import bson
 import mongoengine as db
 
 from .encoder import GoodJSONEncoder
 from .decoder import generate_object_hook
+from .scope import goodjson_scope
+
+_FieldMeta = namedtuple("_FieldMeta", (
+    "name", "field", "is_list", "target", "follow", "is_ref",
+    "exclude_to", "exclude_from"
+))
+_ClassMeta = namedtuple("_ClassMeta", (
+    "fields", "fields_by_name", "exclude_to", "exclude_from", "follow",
+    "references", "needs_goodjson", "renames_id"
+))
+_FIELD_META_CACHE = WeakKeyDictionary()
+_FollowReferenceField = None
+
+
+def _follow_reference_field():
+    """
+    Get FollowReferenceField class.
+
+    fields module imports document module, which imports this module.
+    Therefore, the class is imported at the first call and kept in the
+    module global instead of importing it at every call.
+    """
+    global _FollowReferenceField
+    if _FollowReferenceField is None:
+        from .fields import FollowReferenceField
+        _FollowReferenceField = FollowReferenceField
+    return _FollowReferenceField
+
+
+def _get_field_meta(cls):
+    """
+    Get the field metadata of the class.
+
+    The metadata is computed once per class and cached, because fields
+    are defined at class level and don't change among the instances.
+    exclude_to and exclude_from are frozensets of the names of the fields
+    excluded from to_json and from_json. follow and references are the
+    fields followed by to_json and normalized by from_json.
+    needs_goodjson is False when no field depends on goodjson_scope, i.e.
+    there's neither FollowReferenceField nor EmbeddedDocumentField.
+    renames_id is True when a field is stored as "_id" and no field is
+    stored as "id", i.e. "_id" can always be renamed to "id".
+    """
+    try:
+        return _FIELD_META_CACHE[cls]
+    except KeyError:
+        pass
+    follow_reference_field = _follow_reference_field()
+    fields = []
+    needs_goodjson = False
+    db_fields = set()
+    for (name, fld) in cls._fields.items():
+        db_fields.add(fld.db_field)
+        is_list = isinstance(fld, db.ListField)
+        target = fld.field if is_list else fld
+        is_frf = isinstance(target, follow_reference_field)
+        needs_goodjson = needs_goodjson or is_frf or \
+            isinstance(fld, db.EmbeddedDocumentField)
+        fields.append(_FieldMeta(
+            name=name, field=fld, is_list=is_list, target=target,
+            follow=not is_frf and isinstance(
+                target, (db.ReferenceField, db.EmbeddedDocumentField)
+            ),
+            is_ref=not is_frf and isinstance(target, db.ReferenceField),
+            exclude_to=bool(
+                getattr(fld, "exclude_to_json", None) or
+                getattr(fld, "exclude_json", None)
+            ),
+            exclude_from=bool(
+                getattr(fld, "exclude_from_json", None) or
+                getattr(fld, "exclude_json", None)
+            )
+        ))
+    meta = _ClassMeta(
+        fields=tuple(fields),
+        fields_by_name={meta.name: meta for meta in fields},
+        exclude_to=frozenset(
+            meta.name for meta in fields if meta.exclude_to
+        ),
+        exclude_from=frozenset(
+            meta.name for meta in fields if meta.exclude_from
+        ),
+        follow=tuple(
+            meta for meta in fields if meta.follow and not meta.exclude_to
+        ),
+        references=tuple(meta for meta in fields if meta.is_ref),
+        needs_goodjson=needs_goodjson,
+        renames_id="_id" in db_fields and "id" not in db_fields
+    )
+    _FIELD_META_CACHE[cls] = meta
+    return meta
+
+
+class ToJSONBatchMixin(object):
+    """QuerySet mixin to serialize the documents with a thread pool."""
+
+    def to_json_batch(self, workers=4, **kwargs):
+        """
+        Serialize the documents into a JSON array with a thread pool.
+
+        This pays off when serializing a document waits for the database,
+        e.g. follow_reference=True of the human-readable JSON documents.
+        Encoding plain mongoengine documents is bound by CPU, and therefore
+        the threads don't make it faster.
+
+        Parameters:
+            workers: The number of the threads. Set less than 2 to
+                serialize the documents serially.
+            **kwargs: Keyword arguments passed to to_json of each document.
+                use_db_field, follow_reference and max_depth are available
+                for the human-readable JSON documents only, and plain
+                mongoengine documents pass them to json_util.dumps.
+        """
+        items = list(self)
 
+        def to_json(doc):
+            return doc.to_json(**kwargs)
 
-class QuerySet(db.QuerySet):
+        if ThreadPoolExecutor is None or workers < 2 or len(items) < 2:
+            return "[" + ",".join(map(to_json, items)) + "]"
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return "[" + ",".join(executor.map(to_json, items)) + "]"
+
+
+class QuerySet(ToJSONBatchMixin, db.QuerySet):
     """QuerySet that supports human-readable json."""
 
     def __start_good_json(self):
@@ -31,7 +160,6 @@ class QuerySet(db.QuerySet):
 
     def __get_doc(self, fld, item):
         """Get document as dict or a list of documents."""
-        from .fields import FollowReferenceField
 
         @singledispatch
         def doc(fld, item):
@@ -41,13 +169,11 @@ class QuerySet(db.QuerySet):
         def doc_list(fld, item):
             return [self.__get_doc(fld.field, el) for el in item]
 
-        @doc.register(FollowReferenceField)
+        @doc.register(_follow_reference_field())
         def doc_frl(fld, item):
             doc = fld.document_type.objects(id=item).get()
-            doc.begin_goodjson()
-            result = doc.to_mongo()
-            doc.end_goodjson()
-            return result
+            with goodjson_scope():
+                return doc.to_mongo()
 
         result = doc(fld, item)
 
@@ -59,10 +185,12 @@ class QuerySet(db.QuerySet):
         """Return pymongo encoded dict."""
         lst = super(QuerySet, self).as_pymongo()
         if getattr(self, "$$good_json$$", None):
+            fields = [
+                ("_id" if meta.name == "id" else meta.name, meta.field)
+                for meta in _get_field_meta(self._document).fields
+            ]
             for item in lst:
-                for (name, fld) in self._document._fields.items():
-                    if name == "id":
-                        name = "_id"
+                for (name, fld) in fields:
                     item[name] = self.__get_doc(fld, item[name])
                 if "id" not in item and "_id" in item:
                     item["id"] = item.pop("_id")
@@ -79,15 +207,11 @@ class QuerySet(db.QuerySet):
         # data, and to reduce for loop, picking out the field of which exclude
         # fields are truhty is the idea
         # (If you know more suitable idea, make a PR.).
-        exclude = [
-            name for (name, fld) in self._document._fields.items() if any([
-                getattr(fld, "exclude_to_json", None),
-                getattr(fld, "exclude_json", None)
-            ])
-        ]
-        for dct in lst:
-            for exc in exclude:
-                dct.pop(exc, None)
+        exclude = _get_field_meta(self._document).exclude_to
+        if exclude:
+            for dct in lst:
+                for exc in exclude:
+                    dct.pop(exc, None)
         return json.loads(json.dumps(lst, *args, **kwargs))
 
     def from_json(self, json_data):
@@ -95,15 +219,11 @@ class QuerySet(db.QuerySet):
         mongo_data = json.loads(
             json_data, object_hook=generate_object_hook(self._document)
         )
-        exclude = [
-            name for (name, fld) in self._document._fields.items() if any([
-                getattr(fld, "exclude_from_json", None),
-                getattr(fld, "exclude_json", None)
-            ])
-        ]
-        for item in mongo_data:
-            for exc in exclude:
-                item.pop(exc, None)
+        exclude = _get_field_meta(self._document).exclude_from
+        if exclude:
+            for item in mongo_data:
+                for exc in exclude:
+                    item.pop(exc, None)
         return [
             self._document._from_son(bson.SON(data)) for data in mongo_data
         ]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""GoodJSON serialization scope."""
+
+from contextlib import contextmanager
+import threading
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    class ContextVar(threading.local):
+        """Thread-local substitute of ContextVar for older python."""
+
+        def __init__(self, name, default=None):
+            """Initialize the variable."""
+            self.name = name
+            self.value = default
+
+        def get(self):
+            """Return the current value."""
+            return self.value
+
+        def set(self, value):
+            """Set the value and return the token to reset it."""
+            token, self.value = self.value, value
+            return token
+
+        def reset(self, token):
+            """Reset the value to the one before set was called."""
+            self.value = token
+
+
+# Current recursion depth of FollowReferenceField, or None when the document
+# isn't being serialized into human-readable JSON.
+_GJ_STATE = ContextVar("_GJ_STATE", default=None)
+
+
+@contextmanager
+def goodjson_scope(cur_depth=0):
+    """
+    Serialize the documents into human-readable JSON within the scope.
+
+    This replaces setting $$good_json$$ flag to the fields, which are shared
+    among the all instances of the document class, and therefore the scope
+    is safe to use from the threads and the coroutines.
+
+    Parameters:
+        cur_depth: The current recursion depth of FollowReferenceField. Set
+            None to disable human-readable JSON mode within the scope.
+    """
+    token = _GJ_STATE.set(cur_depth)
+    try:
+        yield
+    finally:
+        _GJ_STATE.reset(token)
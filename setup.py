@@ -29,6 +29,7 @@ setup(
     long_description=long_desc,
     packages=["mongoengine_utils"],
     install_requires=dependencies,
+    extras_require={"fast": ["orjson"]},
     zip_safe=False,
     author="Jeffrey Marvin Forones",
     author_email="aiscenblue@gmail.com",
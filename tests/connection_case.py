@@ -3,8 +3,16 @@
 
 """Database Connection TestCase base class."""
 
+from contextlib import contextmanager
 from unittest import TestCase
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 import mongoengine as db
+from mongomock.collection import Collection
 
 
 class DBConBase(TestCase):
@@ -19,3 +27,18 @@ class DBConBase(TestCase):
     def tearDownClass(cls):
         """Teardown database connection."""
         cls.db.drop_database("goodjson_test")
+
+    @contextmanager
+    def record_finds(self, document_cls):
+        """Record the filters of the queries to the document collection."""
+        filters = []
+        name = document_cls._get_collection_name()
+        find = Collection.find
+
+        def record(collection, filter=None, *args, **kwargs):
+            if collection.name == name:
+                filters.append(filter)
+            return find(collection, filter, *args, **kwargs)
+
+        with patch.object(Collection, "find", record):
+            yield filters
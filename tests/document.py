@@ -3,9 +3,10 @@
 
 """New Document serializer/deserializer."""
 
-from unittest import TestCase
+import json
+from unittest import TestCase, skipIf
 
-from bson import ObjectId
+from bson import Binary, ObjectId
 import mongoengine as db
 from mongoengine_goodjson_aiscenblue import GoodJSONEncoder, Document, EmbeddedDocument
 from mongoengine_goodjson_aiscenblue.document import Helper
@@ -15,6 +16,11 @@ try:
 except ImportError:
     from mock import patch, MagicMock, call
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class DocumentInhertCheck(TestCase):
     """Document and EmbeddedDocument should inhert Helper."""
@@ -52,7 +58,7 @@ class ToJSONTest(TestCase):
             srd.reference = self.references[
                 (index + 1) % len(self.references)
             ]
-            srd.to_json = MagicMock(side_effect=srd.to_json)
+            srd._to_good_dict = MagicMock(side_effect=srd._to_good_dict)
         self.model_cls = TestDocument
         self.model = TestDocument(
             pk=ObjectId(), title="Test", references=self.references
@@ -78,37 +84,120 @@ class ToJSONTest(TestCase):
             self.model.to_mongo(True), cls=GoodJSONEncoder
         )
 
+    @patch("json.dump")
+    def test_document_stream(self, dump):
+        """self.model.to_json_stream should write into the given file."""
+        fp = MagicMock()
+        self.model.to_json_stream(fp)
+        dump.assert_called_once_with(
+            self.model.to_mongo(True), fp, cls=GoodJSONEncoder
+        )
+
+    @patch("json.dump")
+    def test_document_stream_orjson(self, dump):
+        """use_orjson should be ignored by self.model.to_json_stream."""
+        fp = MagicMock()
+        self.model.to_json_stream(fp, use_orjson=True)
+        dump.assert_called_once_with(
+            self.model.to_mongo(True), fp, cls=GoodJSONEncoder
+        )
+
     def test_followreference(self):
-        """self.references.to_json should be called 3 times for each."""
+        """self.references._to_good_dict should be called 3 times for each."""
         self.model.to_json(follow_reference=True)
         for (index, reference) in enumerate(self.references):
             self.assertEqual(
-                reference.to_json.call_count, 3,
-                ("Reference {} should call to_json 3 times").format(index)
+                reference._to_good_dict.call_count, 3,
+                (
+                    "Reference {} should call _to_good_dict 3 times"
+                ).format(index)
             )
-            reference.to_json.assert_has_calls([
+            reference._to_good_dict.assert_has_calls([
                 call(
-                    cls=GoodJSONEncoder, follow_reference=True,
+                    follow_reference=True,
                     use_db_field=True, max_depth=3, current_depth=counter
                 ) for counter in range(1, 4)
             ], any_order=True)
 
     def test_followreference_max_15(self):
-        """self.references.to_json should be called 15 times for each."""
+        """self.references._to_good_dict should be called 15 times for each."""
         self.model.to_json(follow_reference=True, max_depth=15)
         for (index, reference) in enumerate(self.references):
             self.assertEqual(
-                reference.to_json.call_count, 15,
-                ("Reference {} should call to_json 15 times").format(index)
+                reference._to_good_dict.call_count, 15,
+                (
+                    "Reference {} should call _to_good_dict 15 times"
+                ).format(index)
             )
-            reference.to_json.assert_has_calls([
+            reference._to_good_dict.assert_has_calls([
                 call(
-                    cls=GoodJSONEncoder, follow_reference=True,
+                    follow_reference=True,
                     use_db_field=True, max_depth=15, current_depth=counter
                 ) for counter in range(1, 16)
             ], any_order=True)
 
 
+class OrJSONTest(TestCase):
+    """to_json(use_orjson=True) test."""
+
+    def setUp(self):
+        """Setup the class."""
+        class TestDocument(Document):
+            title = db.StringField()
+            data = db.BinaryField()
+
+        self.model = TestDocument(
+            pk=ObjectId(), title="Test", data=Binary(b"test", 0)
+        )
+
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_orjson(self):
+        """The output should be the same as json.dumps except spaces."""
+        self.assertEqual(
+            json.loads(self.model.to_json(use_orjson=True)),
+            json.loads(self.model.to_json())
+        )
+        self.assertNotIn(" ", self.model.to_json(use_orjson=True))
+
+    @patch("mongoengine_goodjson_aiscenblue.document.orjson")
+    def test_orjson_call(self, orjson_mock):
+        """orjson.dumps should be called with GoodJSONEncoder.default."""
+        orjson_mock.dumps.return_value = b"{}"
+        self.assertEqual(self.model.to_json(use_orjson=True), "{}")
+        (data, ), kwargs = orjson_mock.dumps.call_args
+        self.assertEqual(data, self.model._to_good_dict())
+        for value in (self.model.pk, self.model.data):
+            self.assertEqual(
+                kwargs["default"](value), GoodJSONEncoder().default(value)
+            )
+
+    @patch("json.dumps")
+    @patch("mongoengine_goodjson_aiscenblue.document.orjson")
+    def test_fallback(self, orjson_mock, dumps):
+        """json.dumps should be used when orjson raises TypeError."""
+        orjson_mock.dumps.side_effect = TypeError
+        self.model.to_json(use_orjson=True)
+        dumps.assert_called_once_with(
+            self.model._to_good_dict(), cls=GoodJSONEncoder
+        )
+
+    @patch("json.dumps")
+    @patch("mongoengine_goodjson_aiscenblue.document.orjson")
+    def test_with_arguments(self, orjson_mock, dumps):
+        """json.dumps should be used when the other arguments are given."""
+        self.model.to_json(use_orjson=True, indent=2)
+        orjson_mock.dumps.assert_not_called()
+        dumps.assert_called_once_with(
+            self.model._to_good_dict(), cls=GoodJSONEncoder, indent=2
+        )
+
+    @patch("mongoengine_goodjson_aiscenblue.document.orjson")
+    def test_default(self, orjson_mock):
+        """orjson shouldn't be used by default."""
+        self.model.to_json()
+        orjson_mock.dumps.assert_not_called()
+
+
 class FromJSONTest(TestCase):
     """object hook generation invocation test."""
 
@@ -128,3 +217,20 @@ class FromJSONTest(TestCase):
         hook_mock.return_value = lambda x: {"title": "Test"}
         self.model_cls.from_json(self.data)
         hook_mock.assert_called_once_with(self.model_cls)
+
+    @patch("mongoengine_goodjson_aiscenblue.document.generate_object_hook")
+    def test_hook_cache(self, hook_mock):
+        """The object hook should be generated once and reused."""
+        hook_mock.return_value = lambda x: {"title": "Test"}
+        self.model_cls.from_json(self.data)
+        self.model_cls.from_json(self.data)
+        self.assertEqual(hook_mock.call_count, 1)
+
+    @patch("mongoengine_goodjson_aiscenblue.document.generate_object_hook")
+    def test_given_hook(self, hook_mock):
+        """The object hook shouldn't be generated when it is given."""
+        result = self.model_cls.from_json(
+            self.data, object_hook=lambda x: {"title": "Given"}
+        )
+        hook_mock.assert_not_called()
+        self.assertEqual(result.title, "Given")
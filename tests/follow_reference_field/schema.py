@@ -6,20 +6,22 @@
 import mongoengine as db
 
 import mongoengine_goodjson as gj
-import mongoengine_goodjson.document as gj_doc
-import six
 
 
 class Helper(object):
     """Helper class."""
 
-    begin_goodjson = six.get_unbound_function(gj_doc.Helper.begin_goodjson)
-    __set_gj_flag_sub_field = six.get_unbound_function(
-        gj_doc.Helper.__set_gj_flag_sub_field
-    )
-    __unset_gj_flag_sub_field = six.get_unbound_function(
-        gj_doc.Helper.__unset_gj_flag_sub_field
-    )
+    def __init__(self, enable_gj=False, *args, **kwargs):
+        """Init the class."""
+        super(Helper, self).__init__(*args, **kwargs)
+        self.enable_gj = enable_gj
+
+    def to_mongo(self, *args, **kwargs):
+        """Call to_mongo within goodjson_scope if enable_gj is set."""
+        if not self.enable_gj:
+            return super(Helper, self).to_mongo(*args, **kwargs)
+        with gj.goodjson_scope():
+            return super(Helper, self).to_mongo(*args, **kwargs)
 
 
 class ReferencedDocument(db.Document):
@@ -37,20 +39,8 @@ class IDCheckDocument(Helper, db.Document):
 
     ref = gj.FollowReferenceField(ReferencedDocument)
 
-    def __init__(self, enable_gj=False, *args, **kwargs):
-        """Init the class."""
-        super(IDCheckDocument, self).__init__(*args, **kwargs)
-        if enable_gj:
-            self.begin_goodjson()
-
 
 class DisabledIDCheckDocument(Helper, db.Document):
     """Test document disabling id check."""
 
     ref = gj.FollowReferenceField(ReferencedDocument, id_check=False)
-
-    def __init__(self, enable_gj=False, *args, **kwargs):
-        """Init the class."""
-        super(DisabledIDCheckDocument, self).__init__(*args, **kwargs)
-        if enable_gj:
-            self.begin_goodjson()
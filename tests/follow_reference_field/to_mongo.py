@@ -106,7 +106,7 @@ class FollowReferenceFieldReturnValueTest(DBConBase):
         """Setup."""
         self.referenced_doc = ReferencedDocument(name="hi")
         self.referenced_doc.save()
-        self.doc = IDCheckDocument(ref=self.referenced_doc)
+        self.doc = IDCheckDocument(enable_gj=True, ref=self.referenced_doc)
         self.ref_doc = IDCheckDocument(
             enable_gj=True,
             ref=DBRef("referenced_document", self.referenced_doc.pk)
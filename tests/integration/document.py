@@ -3,9 +3,15 @@
 
 """Integration tests."""
 
+from datetime import datetime
 import json
 from unittest import TestCase
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 from bson import ObjectId
 import mongoengine_goodjson as gj
 import mongoengine as db
@@ -104,6 +110,30 @@ class JSONExclusionTest(DBConBase):
         self.assertIn("from_json_exclude", result)
         self.assertIn("required", result)
 
+    def test_to_json_follow_reference(self):
+        """Excluded references shouldn't be followed into the output."""
+        class ExclusionReferenced(gj.Document):
+            name = db.StringField()
+
+        class ExclusionReferenceModel(gj.Document):
+            to_json_exclude = db.ReferenceField(
+                ExclusionReferenced, exclude_to_json=True
+            )
+            json_exclude = db.ReferenceField(
+                ExclusionReferenced, exclude_json=True
+            )
+            ref = db.ReferenceField(ExclusionReferenced)
+
+        referenced = ExclusionReferenced(name="Hello").save()
+        model = ExclusionReferenceModel(
+            to_json_exclude=referenced, json_exclude=referenced,
+            ref=referenced
+        ).save()
+        result = json.loads(model.to_json(follow_reference=True))
+        self.assertNotIn("to_json_exclude", result)
+        self.assertNotIn("json_exclude", result)
+        self.assertEqual(result["ref"]["name"], "Hello")
+
     def test_from_json(self):
         """from_json_exclude and json_exclude shouldn't be decoded."""
         result = self.cls.from_json(json.dumps(self.data))
@@ -153,6 +183,121 @@ class FollowReferenceTest(DBConBase):
         self.assertDictEqual(self.reference_dict, result)
 
 
+class FollowReferenceBatchTest(DBConBase):
+    """The followed references should be fetched at once."""
+
+    def setUp(self):
+        """Setup."""
+        class Referenced(gj.Document):
+            name = db.StringField()
+
+        class Referencing(gj.Document):
+            ref1 = db.ReferenceField(Referenced)
+            ref2 = db.ReferenceField(Referenced)
+            ref3 = db.ReferenceField(Referenced)
+            refs = db.ListField(db.ReferenceField(Referenced))
+
+        self.referenced_cls = Referenced
+        self.referenced = [
+            Referenced(name=("test {}").format(count)).save()
+            for count in range(5)
+        ]
+        self.model = Referencing(
+            ref1=self.referenced[0], ref2=self.referenced[1],
+            ref3=self.referenced[2], refs=self.referenced[3:]
+        ).save()
+        self.model = Referencing.objects(id=self.model.id).get()
+
+    def test_query(self):
+        """The referenced documents should be fetched by one $in query."""
+        with self.record_finds(self.referenced_cls) as filters:
+            result = json.loads(
+                self.model.to_json(follow_reference=True, max_depth=1)
+            )
+        self.assertEqual(len(filters), 1)
+        self.assertEqual(
+            set(filters[0]["_id"]["$in"]),
+            set(doc.id for doc in self.referenced)
+        )
+        self.assertEqual(result["ref1"]["name"], "test 0")
+        self.assertEqual(result["ref3"]["name"], "test 2")
+        self.assertEqual(
+            [ref["name"] for ref in result["refs"]], ["test 3", "test 4"]
+        )
+
+
+class LazyDecodeTest(DBConBase):
+    """from_json(lazy=True) test."""
+
+    def setUp(self):
+        """Setup."""
+        class LazyEmbedded(gj.EmbeddedDocument):
+            value = db.IntField()
+
+        class LazyModel(gj.Document):
+            name = db.StringField()
+            when = db.DateTimeField()
+            embedded = db.EmbeddedDocumentField(LazyEmbedded)
+            tags = db.ListField(db.StringField())
+
+        self.cls = LazyModel
+        self.model = LazyModel(
+            name="test", when=datetime(2020, 1, 2, 3, 4, 5),
+            embedded=LazyEmbedded(value=10), tags=["a", "b"]
+        ).save()
+        self.data = self.model.to_json()
+
+    def test_fields(self):
+        """Each field should be the same as the eagerly decoded one."""
+        eager = self.cls.from_json(self.data)
+        lazy = self.cls.from_json(self.data, lazy=True)
+        for name in ("id", "name", "when", "embedded", "tags"):
+            self.assertEqual(getattr(lazy, name), getattr(eager, name))
+        self.assertEqual(lazy.to_mongo(), eager.to_mongo())
+
+    def test_edit_to_json(self):
+        """Modified fields should be kept by to_json."""
+        lazy = self.cls.from_json(self.data, lazy=True)
+        lazy.tags.append("c")
+        lazy.embedded.value = 20
+        result = json.loads(lazy.to_json())
+        self.assertEqual(result["tags"], ["a", "b", "c"])
+        self.assertEqual(result["embedded"], {"value": 20})
+
+    def test_edit_save(self):
+        """Modified fields should be saved."""
+        lazy = self.cls.from_json(self.data, lazy=True)
+        self.assertEqual(lazy.name, "test")
+        lazy.tags.append("c")
+        lazy.name = "modified"
+        lazy.save()
+        result = self.cls.objects(id=self.model.id).get()
+        self.assertEqual(result.name, "modified")
+        self.assertEqual(result.tags, ["a", "b", "c"])
+
+    def test_follow_reference_autosave(self):
+        """The followed document should be decoded and saved only once."""
+        class LazyReferenced(gj.Document):
+            name = db.StringField()
+
+        class LazyReferencing(gj.Document):
+            user = gj.FollowReferenceField(LazyReferenced, autosave=True)
+
+        referenced = LazyReferenced(name="test").save()
+        data = LazyReferencing(user=referenced).save().to_json()
+        with patch.object(
+            LazyReferenced, "save", autospec=True,
+            side_effect=LazyReferenced.save
+        ) as save:
+            lazy = LazyReferencing.from_json(data, lazy=True)
+            user = lazy.user
+            user.name = "edited"
+            result = json.loads(lazy.to_json())
+        self.assertEqual(save.call_count, 1)
+        self.assertIs(lazy.user, user)
+        self.assertEqual(result["user"]["name"], "edited")
+
+
 class PrimaryKeyNotOidTest(TestCase):
     """Good JSON encoder/decoder email as primary key test."""
 
@@ -8,6 +8,7 @@ import json
 
 import mongoengine_goodjson as gj
 import mongoengine as db
+from mongoengine_utils.pagination import Document
 
 from .schema import User, UserReferenceNoAutoSave
 from .fixtures import users, users_dict
@@ -137,3 +138,96 @@ class FollowReferenceQueryTest(DBConBase):
         """The document referenced by the field should be referenced."""
         result = json.loads(UserReferenceNoAutoSave.objects.to_json())
         self.assertListEqual(result, self.data_ref_users)
+
+
+class ToJSONBatchTest(DBConBase):
+    """QuerySet.to_json_batch test."""
+
+    def setUp(self):
+        """Setup."""
+        class BatchReferenced(gj.Document):
+            name = db.StringField()
+
+        class BatchModel(gj.Document):
+            name = db.StringField()
+            ref = db.ReferenceField(BatchReferenced)
+
+        class PlainBatchModel(Document):
+            name = db.StringField()
+
+        self.cls = BatchModel
+        self.plain_cls = PlainBatchModel
+        for counter in range(5):
+            ref = BatchReferenced(name=("Ref {}").format(counter)).save()
+            BatchModel(name=("Test {}").format(counter), ref=ref).save()
+            PlainBatchModel(name=("Test {}").format(counter)).save()
+
+    def test_to_json_batch(self):
+        """The result should be the same JSON array as the serial one."""
+        result = self.cls.objects.to_json_batch(follow_reference=True)
+        self.assertEqual(
+            result, self.cls.objects.to_json_batch(workers=1,
+                                                   follow_reference=True)
+        )
+        self.assertEqual(json.loads(result), [
+            json.loads(doc.to_json(follow_reference=True))
+            for doc in self.cls.objects
+        ])
+
+    def test_plain_document(self):
+        """The queryset of pagination.Document should have it as well."""
+        result = self.plain_cls.objects.to_json_batch()
+        self.assertEqual(result, self.plain_cls.objects.to_json_batch(
+            workers=1
+        ))
+        self.assertEqual(json.loads(result), [
+            json.loads(doc.to_json()) for doc in self.plain_cls.objects
+        ])
+
+    def test_empty(self):
+        """Empty queryset should be encoded into an empty array."""
+        result = self.cls.objects(name="Nothing").to_json_batch()
+        self.assertEqual(json.loads(result), [])
+
+
+class PlainDocumentQuerySetTest(DBConBase):
+    """QuerySet should work as the queryset class of plain documents."""
+
+    def setUp(self):
+        """Setup."""
+        class PlainModel(db.Document):
+            name = db.StringField()
+            excluded = db.StringField(exclude_json=True)
+            meta = {"queryset_class": gj.QuerySet}
+
+        self.cls = PlainModel
+        self.models = [
+            PlainModel(
+                name=("Test {}").format(counter), excluded="Excluded"
+            ).save() for counter in range(3)
+        ]
+
+    def tearDown(self):
+        """Teardown."""
+        self.cls.drop_collection()
+
+    def test_as_pymongo(self):
+        """The fields should be converted while encoding into JSON."""
+        queryset = self.cls.objects.clone()
+        setattr(queryset, "$$good_json$$", True)
+        self.assertEqual(
+            [item["name"] for item in queryset.as_pymongo()],
+            [model.name for model in self.models]
+        )
+
+    def test_from_json(self):
+        """The excluded field shouldn't be decoded."""
+        result = self.cls.objects.from_json(json.dumps([
+            {"id": str(model.id), "name": model.name, "excluded": "Hi"}
+            for model in self.models
+        ]))
+        self.assertEqual(
+            [(model.id, model.name) for model in result],
+            [(model.id, model.name) for model in self.models]
+        )
+        self.assertEqual([model.excluded for model in result], [None] * 3)
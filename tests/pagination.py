@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""Pagination tests."""
+
+from unittest import TestCase
+
+import mongoengine as db
+from mongoengine_utils import Pagination
+from mongoengine_utils.pagination import Document
+
+from .connection_case import DBConBase
+
+
+class PaginationPagesTest(TestCase):
+    """The number of pages should be computed correctly."""
+
+    def test_pages(self):
+        """The last partial page should be counted."""
+        self.assertEqual(Pagination(list(range(31)), 1, 10).pages, 4)
+
+    def test_pages_exact(self):
+        """No extra page should be counted when total is divisible."""
+        self.assertEqual(Pagination(list(range(30)), 1, 10).pages, 3)
+
+    def test_pages_empty(self):
+        """Empty iterable should have no pages."""
+        self.assertEqual(Pagination([], 1, 10).pages, 0)
+
+    def test_has_next(self):
+        """has_next should be False on the last page."""
+        self.assertTrue(Pagination(list(range(31)), 3, 10).has_next)
+        self.assertFalse(Pagination(list(range(31)), 4, 10).has_next)
+
+
+class PaginationTotalTest(TestCase):
+    """Given total should be used instead of counting the iterable."""
+
+    def test_total(self):
+        """The pages should be computed from the given total."""
+        pagination = Pagination(list(range(10)), 1, 10, total=95)
+        self.assertEqual(pagination.total, 95)
+        self.assertEqual(pagination.pages, 10)
+
+    def test_next_keeps_total(self):
+        """The next page should reuse the total."""
+        pagination = Pagination(list(range(30)), 1, 10, total=30).next()
+        self.assertEqual(pagination.page, 2)
+        self.assertEqual(pagination.total, 30)
+
+
+class PaginationIterPagesTest(TestCase):
+    """iter_pages should yield the page numbers and the gaps."""
+
+    def test_iter_pages(self):
+        """The edges and the pages around the current one are yielded."""
+        pagination = Pagination(list(range(200)), 10, 10)
+        self.assertEqual(
+            list(pagination.iter_pages()),
+            [1, 2, None, 8, 9, 10, 11, 12, None, 19, 20]
+        )
+
+    def test_iter_pages_no_gap(self):
+        """All pages are yielded without gap when there are few pages."""
+        pagination = Pagination(list(range(50)), 2, 10)
+        self.assertEqual(list(pagination.iter_pages()), [1, 2, 3, 4, 5])
+
+    def test_iter_pages_many_pages(self):
+        """The cost shouldn't depend on the number of the pages."""
+        pagination = Pagination(list(range(10)), 1, 10, total=10 ** 10)
+        self.assertEqual(
+            list(pagination.iter_pages()),
+            [1, 2, 3, None, 10 ** 9 - 1, 10 ** 9]
+        )
+
+
+class PaginationEagerRefsTest(DBConBase):
+    """eager_refs should dereference the references of the page at once."""
+
+    def setUp(self):
+        """Setup."""
+        class EagerReferenced(Document):
+            name = db.StringField()
+
+        class EagerModel(Document):
+            name = db.StringField()
+            ref = db.ReferenceField(EagerReferenced)
+            refs = db.ListField(db.ReferenceField(EagerReferenced))
+
+        self.referenced_cls = EagerReferenced
+        self.cls = EagerModel
+        for counter in range(5):
+            ref = EagerReferenced(name=("Ref {}").format(counter)).save()
+            extra = EagerReferenced(name=("Extra {}").format(counter)).save()
+            EagerModel(
+                name=("Test {}").format(counter), ref=ref, refs=[ref, extra]
+            ).save()
+
+    def tearDown(self):
+        """Teardown."""
+        self.referenced_cls.drop_collection()
+        self.cls.drop_collection()
+
+    def test_items(self):
+        """The page should have the same items as without eager_refs."""
+        pagination = self.cls.objects.order_by("name").paginate(
+            2, 2, eager_refs=("ref", "refs")
+        )
+        self.assertEqual(
+            [item.name for item in pagination.items], ["Test 2", "Test 3"]
+        )
+        self.assertEqual(
+            [item.ref.name for item in pagination.items], ["Ref 2", "Ref 3"]
+        )
+        self.assertEqual(
+            [[ref.name for ref in item.refs] for item in pagination.items],
+            [["Ref 2", "Extra 2"], ["Ref 3", "Extra 3"]]
+        )
+
+    def test_query(self):
+        """Each field should be dereferenced by one $in query."""
+        with self.record_finds(self.referenced_cls) as filters:
+            pagination = self.cls.objects.order_by("name").paginate(
+                1, 3, eager_refs=("ref", "refs")
+            )
+            names = [
+                (item.ref.name, [ref.name for ref in item.refs])
+                for item in pagination.items
+            ]
+        self.assertEqual(len(filters), 2)
+        for query in filters:
+            self.assertIn("$in", query["_id"])
+        self.assertEqual(names, [
+            (("Ref {}").format(counter), [
+                ("Ref {}").format(counter), ("Extra {}").format(counter)
+            ]) for counter in range(3)
+        ])